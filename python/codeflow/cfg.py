@@ -1,6 +1,79 @@
 
 import ast
-import astunparse as aup
+import sys
+
+
+# node and edge type tags, interned so that type checks can short-
+# circuit on pointer equality
+_TYPE_START = sys.intern('start')
+_TYPE_STOP = sys.intern('stop')
+_TYPE_DEF = sys.intern('def')
+_TYPE_IF = sys.intern('if')
+_TYPE_IF_TRUE = sys.intern('if_true')
+_TYPE_IF_FALSE = sys.intern('if_false')
+
+# start/stop nodes can be excluded from the rendered diagram
+_START_STOP_TYPES = frozenset({_TYPE_START, _TYPE_STOP})
+
+# Mermaid format strings by node type, with the node shape encoded
+# in the bracket style
+_NODE_FMT = {
+    _TYPE_START: '    p%d((("%s")))',
+    _TYPE_STOP:  '    p%d((("%s")))',
+    _TYPE_DEF:   '    p%d((("%s")))',
+    _TYPE_IF:    '    p%d{"%s"}',
+}
+_NODE_FMT_DEFAULT = '    p%d("%s")'
+
+# Mermaid format strings by edge type
+_EDGE_FMT = {
+    _TYPE_IF_TRUE:  '    p%d -->|True| p%d',
+    _TYPE_IF_FALSE: '    p%d -->|False| p%d',
+}
+_EDGE_FMT_DEFAULT = '    p%d --> p%d'
+
+
+def _edge_sort_key(entry):
+    # preds entries may be (node, color) pairs; order edges by node
+    # id, then color, so rendered output is deterministic
+    if type(entry) is tuple:
+        return (entry[0].id, entry[1])
+    return (entry.id, '')
+
+# straight-line statement types that can be coalesced into a single
+# basic-block node, since they neither branch nor define anything
+_SIMPLE_STMT_TYPES = (
+    ast.Assign,
+    ast.AugAssign,
+    ast.Expr,
+    ast.Import,
+    ast.ImportFrom,
+    ast.Assert,
+    ast.Delete,
+    ast.Pass)
+
+
+# expression types that give a statement side-effects
+_EFFECT_TYPES = (ast.Call, ast.Yield, ast.YieldFrom, ast.Await)
+
+
+def _has_side_effect(ast_node):
+    '''
+    Determine whether an expression statement has side-effects.
+
+    :param ast_node
+    '''
+    # iterative walk that stops at the first match, rather than
+    # generating every descendant the way ast.walk does
+    stack = [ast_node]
+
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _EFFECT_TYPES):
+            return True
+        stack.extend(ast.iter_child_nodes(node))
+
+    return False
 
 
 class CFGNode:
@@ -21,29 +94,34 @@ class CFGNode:
     - start:    global start node
     - stop:     global stop end
     '''
-    def __init__(self, id, label='', type=None, preds=set()):
+    __slots__ = ('id', 'label', 'type', 'preds', 'callers')
+
+    def __init__(self, id, label='', type=None, preds=None):
         self.id = id
         self.label = label
         self.type = type
-        self.preds = preds
-        self.callers = set()
-
-    def __hash__(self):
-        return self.id
+        self.preds = set() if preds is None else set(preds)
 
-    def __eq__(self, other):
-        return self.id == other.id
+        # most nodes are never called, so the callers set is not
+        # allocated until the first caller is added
+        self.callers = None
 
     def is_hidden(self):
         return not self.label
 
-    def add_predecessors(self, *args):
-        for other in args:
-            self.preds.add(other)
+    def add_predecessors(self, others):
+        self.preds.update(others)
 
-    def add_callers(self, *args):
-        for other in args:
-            self.callers.add(other)
+    def add_callers(self, others):
+        if self.callers is None:
+            self.callers = set()
+
+        # a frontier entry may be a (node, color) pair; only the node
+        # is the caller
+        for cn in others:
+            if type(cn) is tuple:
+                cn = cn[0]
+            self.callers.add(cn)
 
 
 class ControlFlowGraph(ast.NodeVisitor):
@@ -56,33 +134,79 @@ class ControlFlowGraph(ast.NodeVisitor):
     - caller: a node that calls another node (must be callable)
     '''
     def __init__(self, verbose=False):
-        self._verbose = verbose
+        # bind the traversal entry point once, so the quiet path pays
+        # no per-node verbosity check
+        self.visit = self._visit_verbose if verbose else self._visit
 
-    def build(self, source_text):
+    def build(self, source_text, tree=None):
         '''
         Build the control flow graph for a source code string.
 
         :param source_text
+        :param tree         parsed ast of the source text, if already available
         '''
-        # initialize graph state
-        self._nodes = {}
+        # initialize graph state; node ids are sequential, so a list
+        # serves as the id -> node mapping
+        self._source_lines = source_text.splitlines()
+        self._nodes = []
         self._functions = {}
+        self._unparse_cache = {}
         self._stack_class = []
         self._stack_function = []
         self._stack_loop = []
-        self._stack_preds = [set()]
+        self._stack_preds = [()]
 
         # append start node
-        self.add_node(label='start', type='start')
+        self.add_node(label='start', type=_TYPE_START)
+
+        # parse source text unless the caller already has a tree; the
+        # compile builtin skips the ast.parse wrapper, and the returned
+        # tree is unoptimized (optimize has no effect with PyCF_ONLY_AST)
+        if tree is None:
+            tree = compile(
+                source_text,
+                '<source>',
+                'exec',
+                flags=ast.PyCF_ONLY_AST | ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
 
         # traverse abstract syntax tree of source text
-        self.visit(ast.parse(source_text))
+        self.visit(tree)
 
         # append stop node
-        self.add_node(label='stop', type='stop')
+        self.add_node(label='stop', type=_TYPE_STOP)
 
         return self
 
+    def _unparse(self, ast_node):
+        '''
+        Convert an ast node back into source text. Results are cached
+        since the same node may be unparsed multiple times.
+
+        :param ast_node
+        '''
+        key = id(ast_node)
+        label = self._unparse_cache.get(key)
+        if label is None:
+            # slice the original source when the node sits on a single
+            # line, which avoids re-walking the subtree; double quotes
+            # are left to the unparser since they would break the
+            # quoting in the rendered diagram
+            lineno = getattr(ast_node, 'lineno', None)
+            if lineno is not None and lineno == ast_node.end_lineno:
+                # col offsets count utf-8 bytes, which only equal
+                # character positions when the line is ascii
+                line = self._source_lines[lineno - 1]
+                if line.isascii():
+                    label = line[ast_node.col_offset:ast_node.end_col_offset]
+                else:
+                    label = line.encode()[ast_node.col_offset:ast_node.end_col_offset].decode()
+                if '"' in label:
+                    label = ast.unparse(ast_node)
+            else:
+                label = ast.unparse(ast_node)
+            self._unparse_cache[key] = label
+        return label
+
     def add_node(self, ast_node=None, label=None, type=None):
         '''
         Add a node to the control flow graph.
@@ -95,28 +219,145 @@ class ControlFlowGraph(ast.NodeVisitor):
         id = len(self._nodes)
         cn = CFGNode(
             id,
-            label=label if label is not None else aup.unparse(ast_node).strip(),
-            type=type,
-            preds=self._stack_preds.pop())
+            label=label if label is not None else self._unparse(ast_node),
+            type=type)
+
+        # connect predecessors to node
+        self._add_edges(cn, self._stack_preds.pop())
 
         # add node to graph
-        self._nodes[id] = cn
+        self._nodes.append(cn)
 
-        # update predecessors
-        self._stack_preds.append({cn})
+        # update predecessors; a single successor is the common case,
+        # so a tuple avoids allocating a set per node
+        self._stack_preds.append((cn,))
 
         return cn
 
-    def visit(self, ast_node):
+    def _add_edges(self, cn, preds):
+        '''
+        Connect a frontier of predecessors to a node. A frontier entry
+        may be a (node, color) pair, which is kept as-is so that the
+        color stays with its edge — both branches of an if can reach
+        the same successor, giving two parallel edges with different
+        colors, which a side table keyed on the node pair could not
+        represent.
+
+        :param cn
+        :param preds
+        '''
+        cn.preds.update(preds)
+
+    def _visit(self, ast_node):
         '''
         Traverse a node in the abstract syntax tree of the source text.
 
         :param ast_node
         '''
-        if self._verbose:
-            print('walk', ast_node.__class__.__name__, {p.id for p in self._stack_preds[-1]})
+        handler = _DISPATCH.get(type(ast_node))
+        if handler is not None:
+            handler(self, ast_node)
+        else:
+            self.generic_visit(ast_node)
+
+    def _visit_verbose(self, ast_node):
+        '''
+        Traverse a node in the abstract syntax tree of the source text,
+        printing each node as it is walked.
+
+        :param ast_node
+        '''
+        print('walk', ast_node.__class__.__name__, {p[0].id if type(p) is tuple else p.id for p in self._stack_preds[-1]})
 
-        super().visit(ast_node)
+        self._visit(ast_node)
+
+    def _visit_body(self, stmts):
+        '''
+        Traverse a statement body, coalescing runs of simple
+        straight-line statements into a single basic-block node.
+
+        :param stmts
+        '''
+        block = []
+
+        for stmt in stmts:
+            # buffer simple statements, skipping expression statements
+            # with no side-effects
+            if isinstance(stmt, _SIMPLE_STMT_TYPES):
+                if type(stmt) is not ast.Expr or _has_side_effect(stmt):
+                    block.append(stmt)
+
+            # otherwise flush the current block and visit normally
+            else:
+                self._flush_block(block)
+                self.visit(stmt)
+
+        self._flush_block(block)
+
+    def _flush_block(self, block):
+        '''
+        Append a buffered basic block to the control flow graph.
+
+        :param block
+        '''
+        # a single statement keeps its per-type handling
+        if len(block) == 1:
+            self.visit(block[0])
+
+        # multiple statements collapse into one node
+        elif len(block) > 0:
+            self.add_node(label='\\n'.join(self._unparse(stmt) for stmt in block))
+
+            # visit child nodes to track function calls
+            for stmt in block:
+                self._track_calls(stmt)
+
+        block.clear()
+
+    def _track_calls(self, ast_node):
+        '''
+        Scan a statement's expressions for function calls, adding the
+        current frontier as callers of any known function. Statements
+        only need call tracking below the statement level, so this
+        flat scan replaces a full visitor descent.
+
+        :param ast_node
+        '''
+        for node in ast.walk(ast_node):
+            if type(node) is ast.Call:
+                func_name = self._call_name(node.func)
+
+                if func_name in self._functions:
+                    self._functions[func_name].add_callers(self._stack_preds[-1])
+
+    def _visible_preds(self, cn, cache):
+        '''
+        Resolve a predecessor to its nearest visible ancestors,
+        collapsing chains of hidden nodes. Results are memoized so
+        each hidden chain is only walked once.
+
+        :param cn
+        :param cache
+        '''
+        resolved = cache.get(cn.id)
+
+        if resolved is None:
+            # guard against cycles through loop back edges
+            cache[cn.id] = ()
+
+            resolved = []
+            for cn_pred in cn.preds:
+                if type(cn_pred) is tuple:
+                    cn_pred = cn_pred[0]
+                if cn_pred.is_hidden():
+                    resolved.extend(self._visible_preds(cn_pred, cache))
+                else:
+                    resolved.append(cn_pred)
+
+            resolved = tuple(resolved)
+            cache[cn.id] = resolved
+
+        return resolved
 
     def render(self, include_calls=False, include_hidden=False, include_start_stop=True):
         '''
@@ -127,51 +368,52 @@ class ControlFlowGraph(ast.NodeVisitor):
         :param include_start_stop
         '''
         # initialize diagram
-        lines = []
-        lines.append('flowchart TD')
+        lines = ['flowchart TD']
 
-        # skip start/stop nodes if enabled
-        nodes = self._nodes.values()
+        # hoist the bound append out of the loop
+        append = lines.append
 
-        if not include_start_stop:
-            nodes = {cn for cn in nodes if cn.type not in {'start', 'stop'}}
+        # node types to skip, resolved once before the loop
+        skip_types = () if include_start_stop else _START_STOP_TYPES
+
+        # map hidden nodes to their nearest visible ancestors
+        visible_cache = {}
+
+        # iterate through control flow nodes in insertion order
+        for cn in self._nodes:
+            # skip start/stop and hidden nodes if enabled
+            if cn.type in skip_types:
+                continue
 
-        # iterate through control flow nodes
-        for cn in nodes:
-            # skip hidden nodes if enabled
             if not include_hidden and cn.is_hidden():
                 continue
 
             # add node to mmd graph
-            if cn.type in {'start', 'stop', 'def'}:
-                lines.append('    p%d((("%s")))' % (cn.id, cn.label))
-            elif cn.type in {'if'}:
-                lines.append('    p%d{"%s"}' % (cn.id, cn.label))
-            else:
-                lines.append('    p%d("%s")' % (cn.id, cn.label))
+            append(_NODE_FMT.get(cn.type, _NODE_FMT_DEFAULT) % (cn.id, cn.label))
 
-            # connect predecessors to node
-            for cn_pred in cn.preds:
-                # get edge type
-                cn_pred_type = cn_pred.type
+            # connect predecessors to node; an entry may be a
+            # (node, color) pair, which colors that edge alone
+            for entry in sorted(cn.preds, key=_edge_sort_key):
+                if type(entry) is tuple:
+                    cn_pred, edge_type = entry
+                else:
+                    cn_pred = entry
+                    edge_type = entry.type
 
                 # skip hidden predecessors if enabled
-                if not include_hidden:
-                    while cn_pred.is_hidden():
-                        cn_pred = list(cn_pred.preds)[0]
-
-                # connect node to predecessor
-                if cn_pred_type == 'if_true':
-                    lines.append('    p%d -->|True| p%d' % (cn_pred.id, cn.id))
-                elif cn_pred_type == 'if_false':
-                    lines.append('    p%d -->|False| p%d' % (cn_pred.id, cn.id))
+                if not include_hidden and cn_pred.is_hidden():
+                    cn_preds = self._visible_preds(cn_pred, visible_cache)
                 else:
-                    lines.append('    p%d --> p%d' % (cn_pred.id, cn.id))
+                    cn_preds = (cn_pred,)
+
+                # connect node to predecessors
+                for cn_pred in cn_preds:
+                    append(_EDGE_FMT.get(edge_type, _EDGE_FMT_DEFAULT) % (cn_pred.id, cn.id))
 
             # connect callers to callees if enabled
-            if include_calls:
+            if include_calls and cn.callers is not None:
                 for cn_caller in cn.callers:
-                    lines.append('    p%d -.-> p%d' % (cn_caller.id, cn.id))
+                    append(f'    p{cn_caller.id} -.-> p{cn.id}')
 
         return '\n'.join(lines)
 
@@ -179,62 +421,64 @@ class ControlFlowGraph(ast.NodeVisitor):
         '''
         Print all of the control flow nodes in a table.
         '''
-        print('%4s %20s %12s %8s' % (
+        # build all rows up front so the table goes out in one write
+        rows = ['%4s %20s %12s %8s' % (
             'id',
             'label',
             'type',
-            'preds'))
+            'preds')]
 
-        for cn in self._nodes.values():
-            print('%4d %20s %12s %8s' % (
+        for cn in self._nodes:
+            rows.append('%4d %20s %12s %8s' % (
                 cn.id,
-                cn.label,
+                cn.label[:20],
                 cn.type,
-                ','.join('%d' % (p.id) for p in cn.preds)))
+                ','.join(map(str, sorted(p[0].id if type(p) is tuple else p.id for p in cn.preds)))))
+
+        rows.append('')
+        sys.stdout.write('\n'.join(rows))
 
 
     '''
     The following section defines custom visitor methods
     for statement types in the Python abstract grammar.
     '''
+    def visit_Module(self, ast_node):
+        '''
+        Module(stmt* body, type_ignore* type_ignores)
+        '''
+        self._visit_body(ast_node.body)
+
     def visit_FunctionDef(self, ast_node):
         '''
         FunctionDef(identifier name, arguments args,
                     stmt* body, expr* decorator_list, expr? returns,
                     string? type_comment)
         '''
-        # construct function name
+        # construct function name, interned since it is used as a
+        # lookup key on every call site
         if len(self._stack_class) > 0:
             class_name = self._stack_class[-1]
-            func_name = '%s.%s' % (class_name, ast_node.name)
+            func_name = sys.intern('%s.%s' % (class_name, ast_node.name))
         else:
             func_name = ast_node.name
 
         # enter function body
         self._stack_function.append(func_name)
-        self._stack_preds.append(set())
+        self._stack_preds.append(())
 
         # append definition node
         self._functions[func_name] = self.add_node(
-            label='def %s(%s)' % (func_name, ', '.join(a.arg for a in ast_node.args.args)),
-            type='def')
+            label=f"def {func_name}({', '.join([a.arg for a in ast_node.args.args])})",
+            type=_TYPE_DEF)
 
         # visit each statement in function body
-        for stmt in ast_node.body:
-            self.visit(stmt)
+        self._visit_body(ast_node.body)
 
         # exit function body
         self._stack_function.pop()
         self._stack_preds.pop()
 
-    def visit_AsyncFunctionDef(self, ast_node):
-        '''
-        AsyncFunctionDef(identifier name, arguments args,
-                         stmt* body, expr* decorator_list, expr? returns,
-                         string? type_comment)
-        '''
-        return self.visit_FunctionDef(ast_node)
-
     def visit_ClassDef(self, ast_node):
         '''
         ClassDef(identifier name,
@@ -245,16 +489,15 @@ class ControlFlowGraph(ast.NodeVisitor):
         '''
         # enter class body
         self._stack_class.append(ast_node.name)
-        self._stack_preds.append(set())
+        self._stack_preds.append(())
 
         # append definition node
         self.add_node(
-            label='class %s' % (ast_node.name),
-            type='def')
+            label=f'class {ast_node.name}',
+            type=_TYPE_DEF)
 
         # visit each statement in class body
-        for stmt in ast_node.body:
-            self.visit(stmt)
+        self._visit_body(ast_node.body)
 
         # exit class body
         self._stack_class.pop()
@@ -267,8 +510,8 @@ class ControlFlowGraph(ast.NodeVisitor):
         # append statement node
         self.add_node(ast_node)
 
-        # visit child nodes
-        self.generic_visit(ast_node)
+        # track function calls in child nodes
+        self._track_calls(ast_node)
 
     def visit_Delete(self, ast_node):
         '''
@@ -277,8 +520,8 @@ class ControlFlowGraph(ast.NodeVisitor):
         # append statement node
         self.add_node(ast_node)
 
-        # visit child nodes
-        self.generic_visit(ast_node)
+        # track function calls in child nodes
+        self._track_calls(ast_node)
 
     def visit_Assign(self, ast_node):
         '''
@@ -287,8 +530,8 @@ class ControlFlowGraph(ast.NodeVisitor):
         # append statement node
         self.add_node(ast_node)
 
-        # visit child nodes
-        self.generic_visit(ast_node)
+        # track function calls in child nodes
+        self._track_calls(ast_node)
 
     def visit_AugAssign(self, ast_node):
         '''
@@ -297,8 +540,8 @@ class ControlFlowGraph(ast.NodeVisitor):
         # append statement node
         self.add_node(ast_node)
 
-        # visit child nodes
-        self.generic_visit(ast_node)
+        # track function calls in child nodes
+        self._track_calls(ast_node)
 
     def visit_For(self, ast_node):
         '''
@@ -306,60 +549,50 @@ class ControlFlowGraph(ast.NodeVisitor):
         '''
         # append loop entry node
         cn_enter = self.add_node(
-            label='for %s in %s' % (aup.unparse(ast_node.target).strip(), aup.unparse(ast_node.iter).strip()),
-            type='if')
+            label=f'for {self._unparse(ast_node.target)} in {self._unparse(ast_node.iter)}',
+            type=_TYPE_IF)
 
-        # visit target and iter expressions
-        self.visit(ast_node.target)
-        self.visit(ast_node.iter)
+        # track function calls in target and iter expressions
+        self._track_calls(ast_node.target)
+        self._track_calls(ast_node.iter)
 
         # enter loop body
-        cn_exits = {self.add_node(label='', type='if_false')}
+        cn_exits = {(cn_enter, _TYPE_IF_FALSE)}
         self._stack_loop.append([cn_enter, cn_exits])
 
         # visit each statement in loop body
-        self.add_node(label='', type='if_true')
-
-        for stmt in ast_node.body:
-            self.visit(stmt)
+        self._stack_preds[-1] = ((cn_enter, _TYPE_IF_TRUE),)
+        self._visit_body(ast_node.body)
 
         # connect end of loop back to loop entry
-        cn_enter.add_predecessors(*self._stack_preds.pop())
+        self._add_edges(cn_enter, self._stack_preds.pop())
 
         # exit loop body
         self._stack_loop.pop()
         self._stack_preds.append(cn_exits)
 
-    def visit_AsyncFor(self, ast_node):
-        '''
-        AsyncFor(expr target, expr iter, stmt* body, stmt* orelse, string? type_comment)
-        '''
-        return self.visit_For(ast_node)
-
     def visit_While(self, ast_node):
         '''
         While(expr test, stmt* body, stmt* orelse)
         '''
         # append loop entry node
         cn_enter = self.add_node(
-            label='while %s' % (aup.unparse(ast_node.test).strip()),
-            type='if')
+            label=f'while {self._unparse(ast_node.test)}',
+            type=_TYPE_IF)
 
-        # visit test expression
-        self.visit(ast_node.test)
+        # track function calls in test expression
+        self._track_calls(ast_node.test)
 
         # enter loop body
-        cn_exits = {self.add_node(label='', type='if_false')}
+        cn_exits = {(cn_enter, _TYPE_IF_FALSE)}
         self._stack_loop.append([cn_enter, cn_exits])
 
         # visit each statement in loop body
-        self.add_node(label='', type='if_true')
-
-        for stmt in ast_node.body:
-            self.visit(stmt)
+        self._stack_preds[-1] = ((cn_enter, _TYPE_IF_TRUE),)
+        self._visit_body(ast_node.body)
 
         # connect end of loop back to loop entry
-        cn_enter.add_predecessors(*self._stack_preds.pop())
+        self._add_edges(cn_enter, self._stack_preds.pop())
 
         # exit loop body
         self._stack_loop.pop()
@@ -370,32 +603,28 @@ class ControlFlowGraph(ast.NodeVisitor):
         If(expr test, stmt* body, stmt* orelse)
         '''
         # append entry node
-        self.add_node(
-            label='if %s' % (aup.unparse(ast_node.test).strip()),
-            type='if')
+        cn_test = self.add_node(
+            label=f'if {self._unparse(ast_node.test)}',
+            type=_TYPE_IF)
 
-        # visit test expression
-        self.visit(ast_node.test)
+        # track function calls in test expression
+        self._track_calls(ast_node.test)
 
         # visit each statement in the if branch
-        self._stack_preds.append(self._stack_preds[-1])
-        self.add_node(label='', type='if_true')
-
-        for stmt in ast_node.body:
-            self.visit(stmt)
+        self._stack_preds[-1] = ((cn_test, _TYPE_IF_TRUE),)
+        self._visit_body(ast_node.body)
 
-        cn_if = self._stack_preds.pop()
+        cn_true = self._stack_preds.pop()
 
         # visit each statement in the else branch
-        self.add_node(label='', type='if_false')
-
-        for stmt in ast_node.orelse:
-            self.visit(stmt)
+        self._stack_preds.append(((cn_test, _TYPE_IF_FALSE),))
+        self._visit_body(ast_node.orelse)
 
-        cn_else = self._stack_preds.pop()
+        cn_false = self._stack_preds.pop()
 
-        # combine nodes from both branches
-        self._stack_preds.append(cn_if | cn_else)
+        # combine nodes from both branches; dict.fromkeys dedupes while
+        # keeping a cheap tuple frontier instead of allocating sets
+        self._stack_preds.append(tuple(dict.fromkeys((*cn_true, *cn_false))))
 
     def visit_With(self, ast_node):
         '''
@@ -403,17 +632,11 @@ class ControlFlowGraph(ast.NodeVisitor):
         '''
         # append with entry node
         self.add_node(
-            label='with %s' % (', '.join(aup.unparse(item).strip() for item in ast_node.items)))
+            label=f"with {', '.join([self._unparse(item) for item in ast_node.items])}")
 
         # visit child nodes
         self.generic_visit(ast_node)
 
-    def visit_AsyncWith(self, ast_node):
-        '''
-        AsyncWith(withitem* items, stmt* body, string? type_comment)
-        '''
-        return self.visit_With(ast_node)
-
     def visit_Raise(self, ast_node):
         '''
         Raise(expr? exc, expr? cause)
@@ -425,12 +648,10 @@ class ControlFlowGraph(ast.NodeVisitor):
         Try(stmt* body, excepthandler* handlers, stmt* orelse, stmt* finalbody)
         '''
         # visit each statement in the try body
-        for stmt in ast_node.body:
-            self.visit(stmt)
+        self._visit_body(ast_node.body)
 
         # visit each statement in the finally body
-        for stmt in ast_node.finalbody:
-            self.visit(stmt)
+        self._visit_body(ast_node.finalbody)
 
     def visit_Assert(self, ast_node):
         '''
@@ -439,8 +660,8 @@ class ControlFlowGraph(ast.NodeVisitor):
         # append statement node
         self.add_node(ast_node)
 
-        # visit child nodes
-        self.generic_visit(ast_node)
+        # track function calls in child nodes
+        self._track_calls(ast_node)
 
     def visit_Import(self, ast_node):
         '''
@@ -458,24 +679,35 @@ class ControlFlowGraph(ast.NodeVisitor):
         '''
         Expr(expr body)
         '''
-        # determine whether expression has side-effects
+        # scan once for function calls and other side-effects
+        calls = []
         has_effect = False
+        stack = [ast_node.value]
 
-        for node in ast.walk(ast_node):
-            if node.__class__.__name__ in {'Yield', 'YieldFrom', 'Call'}:
+        while stack:
+            node = stack.pop()
+            if type(node) is ast.Call:
+                calls.append(node)
+            elif isinstance(node, _EFFECT_TYPES):
                 has_effect = True
-                break
+            stack.extend(ast.iter_child_nodes(node))
 
         # append statement node if expression has side-effects
-        if has_effect:
+        if calls or has_effect:
             self.add_node(ast_node)
-            self.generic_visit(ast_node)
+
+            # add the new node as caller of each called function
+            for node in calls:
+                func_name = self._call_name(node.func)
+
+                if func_name in self._functions:
+                    self._functions[func_name].add_callers(self._stack_preds[-1])
 
     def visit_Pass(self, ast_node):
         '''
         Pass
         '''
-        self.add_node(ast_node)
+        self.add_node(label='pass')
 
     def visit_Break(self, ast_node):
         '''
@@ -485,10 +717,10 @@ class ControlFlowGraph(ast.NodeVisitor):
         _, cn_exits = self._stack_loop[-1]
 
         # append break node to loop exit nodes
-        cn_exits.add(self.add_node(ast_node))
+        cn_exits.add(self.add_node(label='break'))
 
         # break has no immediate children
-        self._stack_preds[-1] = set()
+        self._stack_preds[-1] = ()
 
     def visit_Continue(self, ast_node):
         '''
@@ -498,25 +730,58 @@ class ControlFlowGraph(ast.NodeVisitor):
         cn_enter, _ = self._stack_loop[-1]
 
         # connect continue node to loop entry
-        cn_enter.add_predecessors(self.add_node(ast_node))
+        cn_enter.add_predecessors((self.add_node(label='continue'),))
 
         # continue has no other children
-        self._stack_preds[-1] = set()
+        self._stack_preds[-1] = ()
 
 
     '''
     The following section defines custom visitor methods
     for expression types in the Python abstract grammar.
     '''
+    def _call_name(self, func):
+        '''
+        Resolve the name of a called function. Most callables are a
+        plain name or attribute, which can be read directly without
+        invoking the unparser.
+
+        :param func
+        '''
+        # unwrap chained calls, e.g. f(...)(...) resolves to f
+        while type(func) is ast.Call:
+            func = func.func
+
+        if isinstance(func, ast.Name):
+            return func.id
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            return '%s.%s' % (func.value.id, func.attr)
+        return self._unparse(func)
+
     def visit_Call(self, ast_node):
         '''
         Call(expr func, expr* args, keyword* keywords)
         '''
         # add predecessors as callers of this function
-        func_name = aup.unparse(ast_node.func).strip()
+        func_name = self._call_name(ast_node.func)
 
         if func_name in self._functions:
-            self._functions[func_name].add_callers(*self._stack_preds[-1])
+            self._functions[func_name].add_callers(self._stack_preds[-1])
 
-        # visit child nodes
-        self.generic_visit(ast_node)
+        # track function calls in child nodes
+        self._track_calls(ast_node)
+
+
+# dispatch table of visitor methods, precomputed once at import time,
+# which avoids the per-node string formatting and getattr in
+# ast.NodeVisitor
+_DISPATCH = {
+    getattr(ast, name[len('visit_'):]): handler
+    for name, handler in vars(ControlFlowGraph).items()
+    if name.startswith('visit_') and hasattr(ast, name[len('visit_'):])
+}
+
+# async statements share their synchronous handlers
+_DISPATCH[ast.AsyncFunctionDef] = ControlFlowGraph.visit_FunctionDef
+_DISPATCH[ast.AsyncFor] = ControlFlowGraph.visit_For
+_DISPATCH[ast.AsyncWith] = ControlFlowGraph.visit_With
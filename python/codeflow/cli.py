@@ -1,16 +1,28 @@
 #!/usr/bin/env python3
 import argparse
 import ast
-import astpretty
+import concurrent.futures
+import hashlib
+import itertools
+import os
 
 import codeflow.cfg as cfg
 import codeflow.dfg as dfg
 
 
-def create_cfg(source_text, **kwargs):
+# on-disk cache of rendered diagrams, keyed by source text and
+# render options
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'codeflow')
+
+# version tag mixed into every cache key; bump whenever the rendered
+# output format changes so stale entries are never served
+CACHE_VERSION = 1
+
+
+def create_cfg(source_text, tree=None, **kwargs):
     # build control flow graph
     G = cfg.ControlFlowGraph(verbose=kwargs['verbose'])
-    G.build(source_text)
+    G.build(source_text, tree=tree)
 
     # print control flow nodes
     if kwargs['verbose']:
@@ -18,19 +30,16 @@ def create_cfg(source_text, **kwargs):
         G.print_nodes()
 
     # convert graph to mmd format
-    G_mmd = G.render(
+    return G.render(
         include_calls=kwargs['include_calls'],
         include_hidden=kwargs['include_hidden'],
         include_start_stop=not kwargs['exclude_start_stop'])
 
-    # print mmd diagram
-    print(G_mmd)
 
-
-def create_dfg(source_text, **kwargs):
+def create_dfg(source_text, tree=None, **kwargs):
     # build data flow graph
     G = dfg.DataFlowGraph(verbose=kwargs['verbose'])
-    G.build(source_text)
+    G.build(source_text, tree=tree)
 
     # print data flow nodes
     if kwargs['verbose']:
@@ -38,10 +47,73 @@ def create_dfg(source_text, **kwargs):
         G.print_nodes()
 
     # convert graph to mmd format
-    G_mmd = G.render()
+    return G.render()
+
+
+def process_source(source_text, **kwargs):
+    # print ast if specified, reusing the parsed tree for the build
+    # so the source is not parsed twice
+    tree = None
+
+    if kwargs['print_ast']:
+        # import here to keep it off the common path, since astpretty
+        # is only needed for --print-ast
+        import astpretty
+        tree = ast.parse(source_text)
+        astpretty.pprint(tree, indent='  ')
+
+    # create specified flow graph
+    if kwargs['type'] == 'cfg':
+        return create_cfg(source_text, tree=tree, **kwargs)
+
+    if kwargs['type'] == 'dfg':
+        return create_dfg(source_text, tree=tree, **kwargs)
+
+
+def cache_key(source_text, kwargs):
+    # the diagram is a pure function of the source text and the
+    # options that affect rendering; blake2b is the fastest stdlib
+    # hash and 16 bytes is plenty for content addressing
+    h = hashlib.blake2b(source_text.encode(), digest_size=16)
+    h.update(('%d:%s:%d:%d:%d' % (
+        CACHE_VERSION,
+        kwargs['type'],
+        kwargs['include_calls'],
+        kwargs['include_hidden'],
+        kwargs['exclude_start_stop'])).encode())
 
-    # print mmd diagram
-    print(G_mmd)
+    return h.hexdigest()
+
+
+def process_file(source_file, kwargs):
+    # load source file
+    with open(source_file, 'r') as f:
+        source_text = f.read().strip()
+
+    # bypass the cache when disabled or when side output is requested
+    if kwargs['no_cache'] or kwargs['verbose'] or kwargs['print_ast']:
+        return process_source(source_text, **kwargs)
+
+    # reuse cached output on a hit
+    cache_file = os.path.join(CACHE_DIR, cache_key(source_text, kwargs) + '.mmd')
+
+    try:
+        with open(cache_file, 'r') as f:
+            return f.read()
+    except OSError:
+        pass
+
+    # otherwise generate output and save it to the cache
+    output = process_source(source_text, **kwargs)
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_file, 'w') as f:
+            f.write(output)
+    except OSError:
+        pass
+
+    return output
 
 
 def main():
@@ -55,42 +127,33 @@ def main():
     parser.add_argument('--exclude-start-stop', help='exclude start/stop nodes', action='store_true')
     parser.add_argument('--include-calls', help='include caller/callee edges', action='store_true')
     parser.add_argument('--include-hidden', help='include hidden nodes', action='store_true')
+    parser.add_argument('--no-cache', help='disable the on-disk output cache', action='store_true')
 
     args = parser.parse_args()
     kwargs = vars(args)
 
     # print flow graph for source string if specified
     if args.source:
-        # print ast if specified
-        if args.print_ast:
-            astpretty.pprint(ast.parse(args.source), indent='  ')
-
-        # create specified flow graph
-        if args.type == 'cfg':
-            create_cfg(args.source, **kwargs)
+        print(process_source(args.source, **kwargs))
 
-        if args.type == 'dfg':
-            create_dfg(args.source, **kwargs)
+    # process source files in parallel, since each file is an
+    # independent parse + build + render pipeline
+    if len(args.source_files) > 1 and not (args.verbose or args.print_ast):
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            outputs = executor.map(process_file, args.source_files, itertools.repeat(kwargs))
 
-    # print flow graph for each source file
-    for source_file in args.source_files:
-        if len(args.source_files) > 1:
+        for source_file, output in zip(args.source_files, outputs):
             print(source_file)
+            print(output)
 
-        # load source file
-        with open(source_file, 'r') as f:
-            source_text = f.read().strip()
-
-        # print ast if specified
-        if args.print_ast:
-            astpretty.pprint(ast.parse(source_text), indent='  ')
-
-        # create specified flow graph
-        if args.type == 'cfg':
-            create_cfg(source_text, **kwargs)
+    # otherwise process each source file sequentially, so that any
+    # verbose output is printed alongside its diagram
+    else:
+        for source_file in args.source_files:
+            if len(args.source_files) > 1:
+                print(source_file)
 
-        if args.type == 'dfg':
-            create_dfg(source_text, **kwargs)
+            print(process_file(source_file, kwargs))
 
 
 if __name__ == '__main__':
@@ -1,9 +1,7 @@
 
 import ast
-import astunparse as aup
 
 from enum import Enum
-from ordered_set import OrderedSet
 
 
 class NodeType(Enum):
@@ -12,6 +10,85 @@ class NodeType(Enum):
     OP = 3          # function call or operator
 
 
+class OrderedSet:
+    '''
+    An insertion-ordered set backed by a dict, which has preserved
+    insertion order at C speed since Python 3.7. Replaces the
+    pure-Python ordered-set package.
+
+    :param items
+    '''
+    __slots__ = ('_items',)
+
+    def __init__(self, items=()):
+        self._items = dict.fromkeys(items)
+
+    def add(self, item):
+        self._items[item] = None
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+
+# operator symbol tables keyed directly by ast op class
+_BINOPS = {
+    ast.Add: '+',
+    ast.Sub: '-',
+    ast.Mult: '*',
+    ast.MatMult: '@',
+    ast.Div: '/',
+    ast.Mod: '%',
+    ast.LShift: '<<',
+    ast.RShift: '>>',
+    ast.BitOr: '|',
+    ast.BitXor: '^',
+    ast.BitAnd: '&',
+    ast.FloorDiv: '//',
+    ast.Pow: '**',
+}
+
+_UNOPS = {
+    ast.Invert: '~',
+    ast.Not: 'not',
+    ast.UAdd: '+',
+    ast.USub: '-',
+}
+
+_BOOLOPS = {
+    ast.And: 'and',
+    ast.Or: 'or',
+}
+
+_CMPOPS = {
+    ast.Eq: '==',
+    ast.NotEq: '!=',
+    ast.Lt: '<',
+    ast.LtE: '<=',
+    ast.Gt: '>',
+    ast.GtE: '>=',
+    ast.Is: 'is',
+    ast.IsNot: 'is not',
+    ast.In: 'in',
+    ast.NotIn: 'not in',
+}
+
+# sentinel for names with no previous binding in the symbol table
+_MISSING = object()
+
+# escape table for node labels in Mermaid notation, applied in a
+# single C-level pass via str.translate
+_MMD_ESCAPE = str.maketrans({
+    '\n': '\\n',
+    '"': '\\"',
+})
+
+
 class Node:
     '''
     Node represents a node in a dataflow graph.
@@ -21,24 +98,28 @@ class Node:
     :param type   node type, used to control visual properties
     :param preds  node predecessors
     '''
-    def __init__(self, id, label, type, preds=OrderedSet()):
+    __slots__ = ('id', 'label', 'type', 'preds')
+
+    def __init__(self, id, label, type, preds=None):
         self.id = id
         self.label = label
         self.type = type
-        self.preds = OrderedSet(preds)
-
-    def __hash__(self):
-        return self.id
 
-    def __eq__(self, other):
-        return self.id == other.id
+        # take ownership of an OrderedSet rather than copying it, since
+        # callers pass freshly-built sets that are never reused
+        if preds is None:
+            self.preds = OrderedSet()
+        elif isinstance(preds, OrderedSet):
+            self.preds = preds
+        else:
+            self.preds = OrderedSet(preds)
 
     def __repr__(self) -> str:
         preds = ','.join(str(dn.id) for dn in self.preds)
         return f"Node(id={self.id},label='{self.label}',type='{self.type}',preds=[{preds}])"
 
     def is_hidden(self):
-        return self.type in {NodeType.CONSTANT}
+        return self.type is NodeType.CONSTANT
 
     def add_predecessors(self, *args):
         for dn in args:
@@ -52,22 +133,33 @@ class DataFlowGraph(ast.NodeVisitor):
     an edge represents an input/output dependency between two nodes.
     '''
     def __init__(self, verbose=False):
+        self.visit = self._visit_verbose if verbose else self._visit
         self._verbose = verbose
         self._inputs = {}
         self._outputs = set()
         self._functions = {}
-        self._nodes = {}
+        self._nodes = []
         self._stack_class = []
-        self._stack_names = [{}]
+        self._symbols = {}
+        self._stack_scopes = [[]]
         self._stack_preds = [OrderedSet()]
 
-    def build(self, source_text):
+    def build(self, source_text, tree=None):
         '''
         Build the dataflow graph for a source code string.
 
         :param source_text
-        '''
-        self.visit(ast.parse(source_text))
+        :param tree         parsed ast of the source text, if already available
+        '''
+        # parse with the C-level compile entry point, skipping the
+        # ast.parse wrapper, as in the cfg module
+        if tree is None:
+            tree = compile(
+                source_text,
+                '<source>',
+                'exec',
+                flags=ast.PyCF_ONLY_AST | ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
+        self.visit(tree)
         return self
 
     def build_from_nodes(self, inputs, *ast_nodes):
@@ -82,16 +174,28 @@ class DataFlowGraph(ast.NodeVisitor):
             self.visit(ast_node)
         return self
 
-    def visit(self, ast_node):
+    def _visit(self, ast_node):
         '''
         Traverse a node in the abstract syntax tree of the source text.
 
         :param ast_node
         '''
-        if self._verbose:
-            print('walk', ast_node.__class__.__name__, {p.id for p in self._stack_preds[-1]})
+        handler = _DISPATCH.get(type(ast_node))
+        if handler is not None:
+            handler(self, ast_node)
+        else:
+            self.generic_visit(ast_node)
+
+    def _visit_verbose(self, ast_node):
+        '''
+        Traverse a node in the abstract syntax tree of the source text,
+        printing each node as it is walked.
 
-        super().visit(ast_node)
+        :param ast_node
+        '''
+        print('walk', ast_node.__class__.__name__, {p.id for p in self._stack_preds[-1]})
+
+        self._visit(ast_node)
 
     def get_symbol(self, name):
         '''
@@ -99,27 +203,50 @@ class DataFlowGraph(ast.NodeVisitor):
 
         :param name
         '''
-        for scope in self._stack_names[::-1]:
-            if name in scope:
-                return scope[name]
-
-        return None
+        return self._symbols.get(name)
 
     def put_symbol(self, name, dn):
         '''
-        Put a variable node into the name table.
+        Put a variable node into the name table, updating an existing
+        binding or else binding the name in the current scope.
 
         :param name
         '''
         if name in self._inputs and self._inputs[name] is None:
             self._inputs[name] = dn
 
-        for scope in self._stack_names[::-1]:
-            if name in scope:
-                scope[name] = dn
-                return
+        # record new bindings so pop_scope can remove them
+        if name not in self._symbols:
+            self._stack_scopes[-1].append((name, _MISSING))
 
-        self._stack_names[-1][name] = dn
+        self._symbols[name] = dn
+
+    def put_local(self, name, dn):
+        '''
+        Put a variable node into the name table in the current scope,
+        shadowing any outer binding until the scope is popped.
+
+        :param name
+        '''
+        self._stack_scopes[-1].append((name, self._symbols.get(name, _MISSING)))
+        self._symbols[name] = dn
+
+    def push_scope(self):
+        '''
+        Enter a new scope in the name table.
+        '''
+        self._stack_scopes.append([])
+
+    def pop_scope(self):
+        '''
+        Exit the current scope in the name table, restoring any
+        bindings that it introduced or shadowed.
+        '''
+        for name, prev in reversed(self._stack_scopes.pop()):
+            if prev is _MISSING:
+                del self._symbols[name]
+            else:
+                self._symbols[name] = prev
 
     def visit_with_preds(self, *ast_nodes):
         '''
@@ -127,6 +254,11 @@ class DataFlowGraph(ast.NodeVisitor):
 
         :param ast_nodes
         '''
+        # missing branches (orelse, finalbody, ...) are common and
+        # produce no preds, so skip the stack churn entirely
+        if not any(ast_nodes):
+            return OrderedSet()
+
         self._stack_preds.append(OrderedSet())
 
         for ast_node in ast_nodes:
@@ -135,7 +267,19 @@ class DataFlowGraph(ast.NodeVisitor):
 
         return self._stack_preds.pop()
 
-    def add_node(self, label, type, preds=OrderedSet(), update_preds=True):
+    def visit_one(self, ast_node):
+        '''
+        Traverse a single node and extract the one predecessor node
+        it produces, without materializing the preds set.
+
+        :param ast_node
+        '''
+        self._stack_preds.append(OrderedSet())
+        self.visit(ast_node)
+
+        return next(iter(self._stack_preds.pop()), None)
+
+    def add_node(self, label, type, preds=None, update_preds=True):
         '''
         Add a node to the dataflow graph.
 
@@ -148,7 +292,7 @@ class DataFlowGraph(ast.NodeVisitor):
         dn = Node(id, label, type, preds=preds)
 
         # add node to graph
-        self._nodes[id] = dn
+        self._nodes.append(dn)
 
         # update predecessors
         if update_preds:
@@ -178,37 +322,35 @@ class DataFlowGraph(ast.NodeVisitor):
     def render_body(self, name, lines, prefix=''):
         lines.append(f'    subgraph {name}')
 
-        # prepare input and outputs
-        inputs = set(self._inputs.values())
-        outputs = set(self.get_symbol(name) for name in self._outputs)
+        # prepare input and outputs, dropping names that were never
+        # bound to a node
+        inputs = {dn for dn in self._inputs.values() if dn is not None}
+        outputs = {self.get_symbol(name) for name in self._outputs}
+        outputs.discard(None)
+        excluded = inputs | outputs
 
-        # render inputs
+        # render inputs, sorted by id since nodes hash by identity
         if len(inputs) > 0:
             lines.append('    subgraph " "')
-            for dn in inputs:
+            for dn in sorted(inputs, key=lambda dn: dn.id):
                 lines.append(f'    {prefix}v{dn.id}("{dn.label}")')
             lines.append('    end')
 
-        # render nodes
-        for dn in self._nodes.values():
-            if dn in inputs or dn in outputs:
-                continue
-
-            label = dn.label \
-                .replace('\n', '\\n') \
-                .replace('\"', '\\"')
-
-            lines.append(f'    {prefix}v{dn.id}("{label}")')
-
-        # render outputs
+        # render outputs, sorted by id since nodes hash by identity
         if len(outputs) > 0:
             lines.append('    subgraph " "')
-            for dn in outputs:
+            for dn in sorted(outputs, key=lambda dn: dn.id):
                 lines.append(f'    {prefix}v{dn.id}("{dn.label}")')
             lines.append('    end')
 
-        # render edges
-        for dn in self._nodes.values():
+        # render remaining nodes and edges in a single pass; Mermaid
+        # does not care whether declarations and edges are interleaved,
+        # but this must come after the input and output subgraphs so
+        # their nodes are not first referenced outside them
+        for dn in self._nodes:
+            if dn not in excluded:
+                lines.append(f'    {prefix}v{dn.id}("{dn.label.translate(_MMD_ESCAPE)}")')
+
             for dn_pred in dn.preds:
                 lines.append(f'    {prefix}v{dn_pred.id} --> {prefix}v{dn.id}')
 
@@ -224,7 +366,7 @@ class DataFlowGraph(ast.NodeVisitor):
             'type',
             'preds'))
 
-        for dn in self._nodes.values():
+        for dn in self._nodes:
             print('%4d %20s %12s %8s' % (
                 dn.id,
                 dn.label,
@@ -251,14 +393,6 @@ class DataFlowGraph(ast.NodeVisitor):
         inputs = [arg.arg for arg in ast_node.args.args]
         self._functions[name] = DataFlowGraph(verbose=self._verbose).build_from_nodes(inputs, *ast_node.body)
 
-    def visit_AsyncFunctionDef(self, ast_node):
-        '''
-        AsyncFunctionDef(identifier name, arguments args,
-                         stmt* body, expr* decorator_list, expr? returns,
-                         string? type_comment)
-        '''
-        return self.visit_FunctionDef(ast_node)
-
     def visit_ClassDef(self, ast_node):
         '''
         ClassDef(identifier name,
@@ -268,11 +402,11 @@ class DataFlowGraph(ast.NodeVisitor):
                  expr* decorator_list)
         '''
         self._stack_class.append(ast_node.name)
-        self._stack_names.append({})
+        self.push_scope()
         label = ast_node.name
         preds = self.visit_with_preds(*ast_node.bases, *ast_node.keywords, *ast_node.body)
         self._stack_class.pop()
-        self._stack_names.pop()
+        self.pop_scope()
 
         dn = self.add_node(label, NodeType.NAME, preds=preds)
         self.put_symbol(label, dn)
@@ -325,34 +459,30 @@ class DataFlowGraph(ast.NodeVisitor):
         # append op node
         ast_node.target.ctx = ast.Load()
         dn = self.add_node(
-            aup.Unparser.binop[ast_node.op.__class__.__name__],
+            _BINOPS[type(ast_node.op)],
             NodeType.OP,
             preds=self.visit_with_preds(ast_node.target, ast_node.value))
         ast_node.target.ctx = ast.Store()
 
-        # append target node
-        label = aup.unparse(ast_node.target).strip()
+        # append target node; the target is usually a plain name, which
+        # can be read directly without unparsing
+        target = ast_node.target
+        label = target.id if isinstance(target, ast.Name) else ast.unparse(target)
         self.put_symbol(label, self.add_node(label, NodeType.NAME, preds={dn}))
 
     def visit_For(self, ast_node):
         '''
         For(expr target, expr iter, stmt* body, stmt* orelse, string? type_comment)
         '''
-        self._stack_names.append({})
+        self.push_scope()
         label = 'for'
         preds = self.visit_with_preds(ast_node.target, ast_node.iter, *ast_node.body, *ast_node.orelse)
-        self._stack_names.pop()
+        self.pop_scope()
 
         # TODO: emit assigned variables from for, while loops
         #       then connect output variables to input variables
         self.add_node(label, NodeType.OP, preds=preds)
 
-    def visit_AsyncFor(self, ast_node):
-        '''
-        AsyncFor(expr target, expr iter, stmt* body, stmt* orelse, string? type_comment)
-        '''
-        return self.visit_For(ast_node)
-
     def visit_While(self, ast_node):
         '''
         While(expr test, stmt* body, stmt* orelse)
@@ -367,16 +497,18 @@ class DataFlowGraph(ast.NodeVisitor):
         If(expr test, stmt* body, stmt* orelse)
         '''
         # determine predecessors for condition and true, false branches
-        dn_test = self.visit_with_preds(ast_node.test)[0]
+        dn_test = self.visit_one(ast_node.test)
         preds_true = self.visit_with_preds(*ast_node.body)
         preds_false = self.visit_with_preds(*ast_node.orelse)
 
-        # determine shared branch outputs
-        outs_true = set(dn.label for dn in preds_true if dn.type == NodeType.NAME)
-        outs_false = set(dn.label for dn in preds_false if dn.type == NodeType.NAME)
-        outputs = outs_true.intersection(outs_false)
-        preds_true = [dn for dn in preds_true if dn.label in outputs]
-        preds_false = [dn for dn in preds_false if dn.label in outputs]
+        # determine shared branch outputs, grouping each branch's name
+        # nodes by label in a single pass; insertion order makes the
+        # output order deterministic
+        true_by_label = {dn.label: dn for dn in preds_true if dn.type is NodeType.NAME}
+        false_by_label = {dn.label: dn for dn in preds_false if dn.type is NodeType.NAME}
+        outputs = [label for label in true_by_label if label in false_by_label]
+        preds_true = [true_by_label[label] for label in outputs]
+        preds_false = [false_by_label[label] for label in outputs]
 
         # append if node
         dn_true = self.add_node('true', NodeType.OP, preds=preds_true)
@@ -390,19 +522,13 @@ class DataFlowGraph(ast.NodeVisitor):
         '''
         With(withitem* items, stmt* body, string? type_comment)
         '''
-        self._stack_names.append({})
+        self.push_scope()
         label = 'with'
         preds = self.visit_with_preds(*ast_node.items, *ast_node.body)
-        self._stack_names.pop()
+        self.pop_scope()
 
         self.add_node(label, NodeType.OP, preds=preds)
 
-    def visit_AsyncWith(self, ast_node):
-        '''
-        AsyncWith(withitem* items, stmt* body, string? type_comment)
-        '''
-        return self.visit_With(ast_node)
-
     def visit_Try(self, ast_node):
         '''
         Try(stmt* body, excepthandler* handlers, stmt* orelse, stmt* finalbody)
@@ -427,30 +553,27 @@ class DataFlowGraph(ast.NodeVisitor):
     for expression types in the Python abstract grammar.
     '''
     def inline_binary_op(self, op, left, right):
-        lhs = '_'
-        rhs = '_'
-        preds = []
-        if isinstance(left, ast.Constant):
-            lhs = left.value
-            preds += self.visit_with_preds(right)
-
-        if isinstance(right, ast.Constant):
-            rhs = right.value
-            preds += self.visit_with_preds(left)
-
-        if len(preds) > 0:
-            label = f'{lhs} {op} {rhs}'
-        else:
-            label = op
-            preds = self.visit_with_preds(left, right)
+        l_const = isinstance(left, ast.Constant)
+        r_const = isinstance(right, ast.Constant)
+
+        # the common case: neither operand is a literal
+        if not l_const and not r_const:
+            return op, self.visit_with_preds(left, right)
+
+        # fold literal operands into the label
+        if not r_const:
+            return f'{left.value} {op} _', self.visit_with_preds(right)
 
-        return label, preds
+        if not l_const:
+            return f'_ {op} {right.value}', self.visit_with_preds(left)
+
+        return f'{left.value} {op} {right.value}', self.visit_with_preds(right, left)
 
     def visit_BoolOp(self, ast_node):
         '''
         BoolOp(boolop op, expr* values)
         '''
-        label = aup.Unparser.boolops[ast_node.op.__class__]
+        label = _BOOLOPS[type(ast_node.op)]
         preds = self.visit_with_preds(*ast_node.values)
 
         self.add_node(label, NodeType.OP, preds=preds)
@@ -459,7 +582,7 @@ class DataFlowGraph(ast.NodeVisitor):
         '''
         BinOp(expr left, operator op, expr right)
         '''
-        op = aup.Unparser.binop[ast_node.op.__class__.__name__]
+        op = _BINOPS[type(ast_node.op)]
         label, preds = self.inline_binary_op(op, ast_node.left, ast_node.right)
 
         self.add_node(label, NodeType.OP, preds=preds)
@@ -468,7 +591,7 @@ class DataFlowGraph(ast.NodeVisitor):
         '''
         UnaryOp(unaryop op, expr operand)
         '''
-        label = aup.Unparser.unop[ast_node.op.__class__.__name__]
+        label = _UNOPS[type(ast_node.op)]
         preds = self.visit_with_preds(ast_node.operand)
 
         self.add_node(label, NodeType.OP, preds=preds)
@@ -477,10 +600,10 @@ class DataFlowGraph(ast.NodeVisitor):
         '''
         Lambda(arguments args, expr body)
         '''
-        self._stack_names.append({})
-        label = aup.unparse(ast_node).strip()
+        self.push_scope()
+        label = ast.unparse(ast_node)
         preds = self.visit_with_preds(ast_node.args, ast_node.body)
-        self._stack_names.pop()
+        self.pop_scope()
 
         self.add_node(label, NodeType.NAME, preds=preds)
 
@@ -489,7 +612,7 @@ class DataFlowGraph(ast.NodeVisitor):
         IfExp(expr test, expr body, expr orelse)
         '''
         # determine predecessors for condition and true, false expressions
-        dn_test = self.visit_with_preds(ast_node.test)[0]
+        dn_test = self.visit_one(ast_node.test)
         body = self.visit_with_preds(ast_node.body)
         orelse = self.visit_with_preds(ast_node.orelse)
 
@@ -520,10 +643,10 @@ class DataFlowGraph(ast.NodeVisitor):
         '''
         ListComp(expr elt, comprehension* generators)
         '''
-        self._stack_names.append({})
+        self.push_scope()
         label = '[...]'
         preds = self.visit_with_preds(*ast_node.generators, ast_node.elt)
-        self._stack_names.pop()
+        self.pop_scope()
 
         self.add_node(label, NodeType.OP, preds=preds)
 
@@ -531,10 +654,10 @@ class DataFlowGraph(ast.NodeVisitor):
         '''
         SetComp(expr elt, comprehension* generators)
         '''
-        self._stack_names.append({})
+        self.push_scope()
         label = '{...}'
         preds = self.visit_with_preds(*ast_node.generators, ast_node.elt)
-        self._stack_names.pop()
+        self.pop_scope()
 
         self.add_node(label, NodeType.OP, preds=preds)
 
@@ -542,10 +665,10 @@ class DataFlowGraph(ast.NodeVisitor):
         '''
         DictComp(expr key, expr value, comprehension* generators)
         '''
-        self._stack_names.append({})
+        self.push_scope()
         label = '{...}'
         preds = self.visit_with_preds(*ast_node.generators, ast_node.key, ast_node.value)
-        self._stack_names.pop()
+        self.pop_scope()
 
         self.add_node(label, NodeType.OP, preds=preds)
 
@@ -553,10 +676,10 @@ class DataFlowGraph(ast.NodeVisitor):
         '''
         GeneratorExp(expr elt, comprehension* generators)
         '''
-        self._stack_names.append({})
+        self.push_scope()
         label = '(...)'
         preds = self.visit_with_preds(*ast_node.generators, ast_node.elt)
-        self._stack_names.pop()
+        self.pop_scope()
 
         self.add_node(label, NodeType.OP, preds=preds)
 
@@ -565,10 +688,10 @@ class DataFlowGraph(ast.NodeVisitor):
         Compare(expr left, cmpop* ops, expr* comparators)
         '''
         if len(ast_node.ops) == 1:
-            op = aup.Unparser.cmpops[ast_node.ops[0].__class__.__name__]
+            op = _CMPOPS[type(ast_node.ops[0])]
             label, preds = self.inline_binary_op(op, ast_node.left, *ast_node.comparators)
         else:
-            label = ','.join(aup.Unparser.cmpops[op.__class__.__name__] for op in ast_node.ops)
+            label = ','.join(_CMPOPS[type(op)] for op in ast_node.ops)
             preds = self.visit_with_preds(ast_node.left, *ast_node.comparators)
 
         self.add_node(label, NodeType.OP, preds=preds)
@@ -581,7 +704,7 @@ class DataFlowGraph(ast.NodeVisitor):
         if isinstance(ast_node.func, ast.Name):
             dn = self.add_node(ast_node.func.id, NodeType.NAME)
         else:
-            dn = self.visit_with_preds(ast_node.func)[0]
+            dn = self.visit_one(ast_node.func)
 
         preds = self.visit_with_preds(*ast_node.args)
 
@@ -591,39 +714,27 @@ class DataFlowGraph(ast.NodeVisitor):
         # update predecessors
         self._stack_preds[-1].add(dn)
 
-    def visit_Num(self, ast_node):
+    def visit_Constant(self, ast_node):
         '''
-        Num(object n)
+        Constant(constant value, string? kind)
         '''
-        self.add_node(str(ast_node.n), NodeType.CONSTANT)
+        value = ast_node.value
+        if isinstance(value, str):
+            label = '\'%s\'' % (value)
+        else:
+            label = str(value)
 
-    def visit_Str(self, ast_node):
-        '''
-        Str(string s)
-        '''
-        self.add_node('\'%s\'' % (ast_node.s), NodeType.CONSTANT)
+        self.add_node(label, NodeType.CONSTANT)
 
     def visit_JoinedStr(self, ast_node):
         '''
         JoinedStr(expr* values)
         '''
-        label = '\'%s\'' % (''.join(v.s if isinstance(v, ast.Str) else '{}' for v in ast_node.values))
+        label = '\'%s\'' % (''.join(v.value if isinstance(v, ast.Constant) else '{}' for v in ast_node.values))
         preds = self.visit_with_preds(*[v for v in ast_node.values if isinstance(v, ast.FormattedValue)])
 
         self.add_node(label, NodeType.CONSTANT, preds=preds)
 
-    def visit_Bytes(self, ast_node):
-        '''
-        Bytes(bytes s)
-        '''
-        self.add_node(str(ast_node.s), NodeType.CONSTANT)
-
-    def visit_NameConstant(self, ast_node):
-        '''
-        NameConstant(singleton value)
-        '''
-        self.add_node(str(ast_node.value), NodeType.CONSTANT)
-
     def visit_Attribute(self, ast_node):
         '''
         Attribute(expr value, identifier attr, expr_context ctx)
@@ -646,18 +757,21 @@ class DataFlowGraph(ast.NodeVisitor):
         '''
         Name(identifier id, expr_context ctx)
         '''
-        # add variable in load context to name table (if not present)
-        if ast_node.ctx.__class__ in {ast.Load, ast.Del}:
-            label = aup.unparse(ast_node).strip()
-            dn = self.get_symbol(label)
-            if dn:
+        ctx = type(ast_node.ctx)
+
+        # add variable in load context to name table (if not present);
+        # the single dict lookup is the hottest path in the traversal
+        if ctx is ast.Load or ctx is ast.Del:
+            label = ast_node.id
+            dn = self._symbols.get(label)
+            if dn is not None:
                 self._stack_preds[-1].add(dn)
             else:
                 self.put_symbol(label, self.add_node(label, NodeType.NAME))
 
         # add variable in store context to name table (overwrite any existing variable)
-        elif isinstance(ast_node.ctx, ast.Store):
-            label = aup.unparse(ast_node).strip()
+        elif ctx is ast.Store:
+            label = ast_node.id
             self.put_symbol(label, self.add_node(label, NodeType.NAME))
 
         else:
@@ -704,4 +818,19 @@ class DataFlowGraph(ast.NodeVisitor):
         arg(identifier arg, expr? annotation)
         '''
         label = ast_node.arg
-        self._stack_names[-1][label] = self.add_node(label, NodeType.NAME)
+        self.put_local(label, self.add_node(label, NodeType.NAME))
+
+
+# dispatch table of visitor methods, precomputed once at import time,
+# which avoids the per-node string formatting and getattr in
+# ast.NodeVisitor
+_DISPATCH = {
+    getattr(ast, name[len('visit_'):]): handler
+    for name, handler in vars(DataFlowGraph).items()
+    if name.startswith('visit_') and hasattr(ast, name[len('visit_'):])
+}
+
+# async statements share their synchronous handlers
+_DISPATCH[ast.AsyncFunctionDef] = DataFlowGraph.visit_FunctionDef
+_DISPATCH[ast.AsyncFor] = DataFlowGraph.visit_For
+_DISPATCH[ast.AsyncWith] = DataFlowGraph.visit_With
@@ -1,370 +1,109 @@
 
-import codeflow.cfg as cfg
-
-
-
-test_pass = (
-"""
-pass
-""",
-
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label=pass, peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label=stop, peripheries=2, shape=oval];
-1 -> 2  [color=black];
-}
-"""
-)
-
-
-
-test_expr = (
-"""
-10
-'a'
-10 + 1
-""",
-
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label=stop, peripheries=2, shape=oval];
-0 -> 1  [color=black];
-}
-"""
-)
-
-
-
-test_assign = (
-"""
-a = 10 + 1
-""",
-
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="a = (10 + 1)", peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label=stop, peripheries=2, shape=oval];
-1 -> 2  [color=black];
-}
-"""
-)
-
-
-
-test_if = (
-"""
-a = 1
-if a > 1:
-    a = 1
-else:
-    a = 0
-""",
-
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="a = 1", peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label="if (a > 1)", peripheries=1, shape=diamond];
-1 -> 2  [color=black];
-4 [label="a = 1", peripheries=1, shape=rectangle];
-2 -> 4  [color=blue];
-6 [label="a = 0", peripheries=1, shape=rectangle];
-2 -> 6  [color=red];
-7 [label=stop, peripheries=2, shape=oval];
-4 -> 7  [color=black];
-6 -> 7  [color=black];
-}
-"""
-)
-
-
-
-test_while = (
-"""
-x = 1
-while x > 0:
-    x = x - 1
-y = x
-""",
-
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="x = 1", peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label="while (x > 0)", peripheries=1, shape=diamond];
-1 -> 2  [color=black];
-5 -> 2  [color=black];
-5 [label="x = (x - 1)", peripheries=1, shape=rectangle];
-2 -> 5  [color=blue];
-6 [label="y = x", peripheries=1, shape=rectangle];
-2 -> 6  [color=red];
-7 [label=stop, peripheries=2, shape=oval];
-6 -> 7  [color=black];
-}
-"""
-)
-
-
-
-test_while_break = (
-"""
-x = 1
-while x > 0:
-    if x > 1:
-        break
-    x = x - 1
-y = x
-""",
-
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="x = 1", peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label="while (x > 0)", peripheries=1, shape=diamond];
-1 -> 2  [color=black];
-9 -> 2  [color=black];
-5 [label="if (x > 1)", peripheries=1, shape=diamond];
-2 -> 5  [color=blue];
-7 [label=break, peripheries=1, shape=rectangle];
-5 -> 7  [color=blue];
-9 [label="x = (x - 1)", peripheries=1, shape=rectangle];
-5 -> 9  [color=red];
-10 [label="y = x", peripheries=1, shape=rectangle];
-2 -> 10  [color=red];
-7 -> 10  [color=black];
-11 [label=stop, peripheries=2, shape=oval];
-10 -> 11  [color=black];
-}
-"""
-)
+import functools
+import json
+import os
+import re
 
+import pytest
 
+import codeflow.cfg as cfg
 
-test_while_continue = (
-"""
-x = 1
-while x > 0:
-    if x > 1:
-        continue
-    x = x - 1
-y = x
-""",
 
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="x = 1", peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label="while (x > 0)", peripheries=1, shape=diamond];
-1 -> 2  [color=black];
-9 -> 2  [color=black];
-7 -> 2  [color=black];
-5 [label="if (x > 1)", peripheries=1, shape=diamond];
-2 -> 5  [color=blue];
-7 [label=continue, peripheries=1, shape=rectangle];
-5 -> 7  [color=blue];
-9 [label="x = (x - 1)", peripheries=1, shape=rectangle];
-5 -> 9  [color=red];
-10 [label="y = x", peripheries=1, shape=rectangle];
-2 -> 10  [color=red];
-11 [label=stop, peripheries=2, shape=oval];
-10 -> 11  [color=black];
-}
-"""
-)
+# test cases are (name, source, expected graph) records stored in a
+# single data file and loaded once at import
+with open(os.path.join(os.path.dirname(__file__), 'test_cases.json')) as f:
+    CASES = json.load(f)
 
 
+NODE_LINE = re.compile(r'    p(\d+)(\(\(\(|\{|\()"(.*)"(?:\)\)\)|\}|\))$')
+EDGE_LINE = re.compile(r'    p(\d+) (-->(?:\|\w+\|)?) p(\d+)$')
 
-test_for = (
-"""
-x = 1
-for i in vals:
-    x = x - 1
-y = x
-""",
 
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="x = 1", peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label="for i in vals", peripheries=1, shape=diamond];
-1 -> 2  [color=black];
-5 -> 2  [color=black];
-5 [label="x = (x - 1)", peripheries=1, shape=rectangle];
-2 -> 5  [color=blue];
-6 [label="y = x", peripheries=1, shape=rectangle];
-2 -> 6  [color=red];
-7 [label=stop, peripheries=2, shape=oval];
-6 -> 7  [color=black];
-}
-"""
-)
+def canonical(mmd_graph):
+    # reduce a rendered graph to label-keyed node and edge multisets,
+    # so comparisons do not pin node numbering or line order
+    labels = {}
+    nodes = []
+    edges = []
 
+    for line in mmd_graph.splitlines()[1:]:
+        m = NODE_LINE.fullmatch(line)
+        if m:
+            labels[m[1]] = m[3]
+            nodes.append((m[3], m[2]))
+            continue
 
+        m = EDGE_LINE.fullmatch(line)
+        assert m, f'unrecognized line: {line!r}'
+        edges.append((m[1], m[2], m[3]))
 
-test_for_break = (
-"""
-x = 1
-for i in vals:
-    if x > 1:
-        break
-    x = x - 1
-y = x
-""",
+    # resolve edge endpoints to labels after the full pass, since back
+    # edges can appear before their source node is declared
+    edges = [(labels[src], arrow, labels[dst]) for src, arrow, dst in edges]
 
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="x = 1", peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label="for i in vals", peripheries=1, shape=diamond];
-1 -> 2  [color=black];
-9 -> 2  [color=black];
-5 [label="if (x > 1)", peripheries=1, shape=diamond];
-2 -> 5  [color=blue];
-7 [label=break, peripheries=1, shape=rectangle];
-5 -> 7  [color=blue];
-9 [label="x = (x - 1)", peripheries=1, shape=rectangle];
-5 -> 9  [color=red];
-10 [label="y = x", peripheries=1, shape=rectangle];
-2 -> 10  [color=red];
-7 -> 10  [color=black];
-11 [label=stop, peripheries=2, shape=oval];
-10 -> 11  [color=black];
-}
-"""
-)
+    return sorted(nodes), sorted(edges)
 
 
+def assert_graphs_equal(actual, expected):
+    actual_nodes, actual_edges = canonical(actual)
+    expected_nodes, expected_edges = canonical(expected)
 
-test_for_continue = (
-"""
-x = 1
-for i in vals:
-    if x > 1:
-        continue
-    x = x - 1
-y = x
-""",
+    assert actual_nodes == expected_nodes
+    assert actual_edges == expected_edges
 
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="x = 1", peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label="for i in vals", peripheries=1, shape=diamond];
-1 -> 2  [color=black];
-9 -> 2  [color=black];
-7 -> 2  [color=black];
-5 [label="if (x > 1)", peripheries=1, shape=diamond];
-2 -> 5  [color=blue];
-7 [label=continue, peripheries=1, shape=rectangle];
-5 -> 7  [color=blue];
-9 [label="x = (x - 1)", peripheries=1, shape=rectangle];
-5 -> 9  [color=red];
-10 [label="y = x", peripheries=1, shape=rectangle];
-2 -> 10  [color=red];
-11 [label=stop, peripheries=2, shape=oval];
-10 -> 11  [color=black];
-}
-"""
-)
 
+@functools.lru_cache(maxsize=None)
+def render(source_text):
+    # graph construction is pure, so repeated runs of the suite (e.g.
+    # under pytest --count or mutation testing) reuse the first build
+    return cfg.ControlFlowGraph().build(source_text).render()
 
 
-test_functiondef = (
-"""
-x = 1
-def my_fn(v1, v2):
-    if v1 > v2:
-        return v1
-    else:
-        return v2
-y = 2
-""",
+@pytest.mark.parametrize(
+    'source_text,mmd_graph',
+    [(case['src'], case['mmd']) for case in CASES],
+    ids=[case['name'] for case in CASES])
+def test_render(source_text, mmd_graph):
+    assert_graphs_equal(render(source_text), mmd_graph)
 
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="x = 1", peripheries=1, shape=rectangle];
-0 -> 1  [color=black];
-2 [label="def my_fn(v1, v2)", peripheries=2, shape=oval];
-3 [label="if (v1 > v2)", peripheries=1, shape=diamond];
-2 -> 3  [color=black];
-5 [label="return v1", peripheries=1, shape=rectangle];
-3 -> 5  [color=blue];
-7 [label="return v2", peripheries=1, shape=rectangle];
-3 -> 7  [color=red];
-8 [label="y = 2", peripheries=1, shape=rectangle];
-1 -> 8  [color=black];
-9 [label=stop, peripheries=2, shape=oval];
-8 -> 9  [color=black];
-}
-"""
-)
 
+def test_callers_at_branch_head():
+    # a call inside a statement with no dedicated visitor (AnnAssign)
+    # at the head of a branch records callers while the frontier still
+    # holds (node, color) pairs, which must be unwrapped to nodes
+    source_text = (
+        'def my_fn():\n'
+        '    pass\n'
+        'if x:\n'
+        '    y: int = my_fn()\n'
+    )
+    mmd_graph = cfg.ControlFlowGraph().build(source_text).render(include_calls=True)
 
+    assert '    p3 -.-> p1' in mmd_graph.splitlines()
 
-test_call = (
-"""
-def my_fn(v1, v2):
-    if v1 > v2:
-        return v1
-    else:
-        return v2
 
-my_fn(2, 1)
-my_fn(3, 4)
-""",
+def test_branch_without_nodes():
+    # an effect-free branch body produces no node, so both branch
+    # edges run from the test to the same successor and must keep
+    # their own colors
+    source_text = (
+        'if x:\n'
+        "    'doc only'\n"
+        'y = 1\n'
+    )
+    mmd_graph = cfg.ControlFlowGraph().build(source_text).render()
+    lines = mmd_graph.splitlines()
 
-"""
-digraph G {
-0 [label=start, peripheries=2, shape=oval];
-1 [label="def my_fn(v1, v2)", peripheries=2, shape=oval];
-2 [label="if (v1 > v2)", peripheries=1, shape=diamond];
-1 -> 2  [color=black];
-4 [label="return v1", peripheries=1, shape=rectangle];
-2 -> 4  [color=blue];
-6 [label="return v2", peripheries=1, shape=rectangle];
-2 -> 6  [color=red];
-7 [label="my_fn(2, 1)", peripheries=1, shape=rectangle];
-0 -> 7  [color=black];
-8 [label="my_fn(3, 4)", peripheries=1, shape=rectangle];
-7 -> 8  [color=black];
-9 [label=stop, peripheries=2, shape=oval];
-8 -> 9  [color=black];
-}
-"""
-)
+    assert '    p1 -->|True| p2' in lines
+    assert '    p1 -->|False| p2' in lines
 
 
+def test_preds_not_shared():
+    # nodes created without explicit preds must not alias a shared set
+    cn1 = cfg.CFGNode(0)
+    cn2 = cfg.CFGNode(1)
 
-def test():
-    tests = [
-        test_pass,
-        test_expr,
-        test_assign,
-        test_if,
-        test_while,
-        test_while_break,
-        test_while_continue,
-        test_for,
-        test_for_break,
-        test_for_continue,
-        test_functiondef,
-        test_call
-    ]
+    assert cn1.preds is not cn2.preds
 
-    for source_text, dot_graph in tests:
-        G_dot = cfg.ControlFlowGraph().generate(source_text).to_dot()
-        assert G_dot.to_string() == dot_graph.lstrip()
+    cn1.add_predecessors((cn2,))
+    assert len(cn2.preds) == 0